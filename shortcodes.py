@@ -51,16 +51,40 @@ class ShortcodeRenderingError(ShortcodeError):
 # Input text is parsed into a tree of Node instances.
 class Node:
 
+    __slots__ = ('children',)
+
     def __init__(self):
         self.children = []
 
     def render(self, context):
-        return ''.join(child.render(context) for child in self.children)
+        return self.render_children(context)
+
+    # Block-scoped shortcodes are rendered using an explicit stack rather than
+    # by recursion so deeply-nested input can't exceed the recursion limit.
+    # Each stack entry holds a node, an iterator over its remaining children,
+    # and the list of its children's rendered output.
+    def render_children(self, context):
+        stack = [(self, iter(self.children), [])]
+        while True:
+            node, children, output = stack[-1]
+            for child in children:
+                if isinstance(child, BlockShortcode):
+                    stack.append((child, iter(child.children), []))
+                    break
+                output.append(child.render(context))
+            else:
+                stack.pop()
+                content = ''.join(output)
+                if not stack:
+                    return content
+                stack[-1][2].append(node.render_content(context, content))
 
 
 # Represents ordinary text not enclosed in tag delimiters.
 class Text(Node):
 
+    __slots__ = ('text',)
+
     def __init__(self, text):
         self.text = text
 
@@ -71,6 +95,8 @@ class Text(Node):
 # Base class for atomic and block-scoped shortcodes.
 class Shortcode(Node):
 
+    __slots__ = ('token', 'handler', 'pargs', 'kwargs')
+
     # Regex for parsing the shortcode's arguments.
     re_args = re.compile(r"""
         (?:([^\s'"=]+)=)?
@@ -88,27 +114,44 @@ class Shortcode(Node):
     def __init__(self, token, handler_function):
         self.token = token
         self.handler = handler_function
-        self.pargs, self.kwargs = self.parse_args(token.text[len(token.keyword):])
+        self.pargs, self.kwargs = self.parse_args(token.args)
         self.children = []
 
+    # Arguments containing quotes are parsed using the regex. Otherwise every
+    # whitespace-separated word is a single argument and we can avoid the
+    # overhead of the regex engine by splitting the string directly.
     def parse_args(self, argstring):
         pargs, kwargs = [], {}
+        if not argstring:
+            return pargs, kwargs
+        if not '"' in argstring and not "'" in argstring:
+            for word in argstring.split():
+                key, _, value = word.partition('=')
+                if key and value:
+                    kwargs[key] = value
+                else:
+                    pargs.append(word)
+            return pargs, kwargs
         for match in self.re_args.finditer(argstring):
-            if match.group(2) or match.group(5):
-                key = match.group(1) or match.group(5)
-                value = match.group(3) or match.group(4) or match.group(6)
+            if match.lastindex == 7:
+                pargs.append(match.group(7))
+            elif match.lastindex == 6:
+                kwargs[match.group(5)] = match.group(6)
+            else:
+                key, dq_value, sq_value = match.group(1, 3, 4)
+                value = sq_value if dq_value is None else dq_value
                 if key:
                     kwargs[key] = value
                 else:
                     pargs.append(value)
-            else:
-                pargs.append(match.group(7))
         return pargs, kwargs
 
 
 # An atomic shortcode is a shortcode with no closing tag.
 class AtomicShortcode(Shortcode):
 
+    __slots__ = ()
+
     # If the shortcode handler raises an exception we intercept it and wrap it
     # in a ShortcodeRenderingError. The original exception will still be
     # available via the exception's __cause__ attribute.
@@ -124,11 +167,15 @@ class AtomicShortcode(Shortcode):
 # A block-scoped shortcode is a shortcode with a closing tag.
 class BlockShortcode(Shortcode):
 
+    __slots__ = ()
+
     # If the shortcode handler raises an exception we intercept it and wrap it
     # in a ShortcodeRenderingError. The original exception will still be
     # available via the exception's __cause__ attribute.
     def render(self, context):
-        content = ''.join(child.render(context) for child in self.children)
+        return self.render_content(context, self.render_children(context))
+
+    def render_content(self, context, content):
         try:
             return str(self.handler(self.pargs, self.kwargs, context, content))
         except Exception as ex:
@@ -173,13 +220,17 @@ class Parser:
 
         stack  = [Node()]
         expecting = []
+        keywords = self.keywords
+        endwords = self.endwords
 
         lexer = Lexer(text, self.start, self.end, self.esc_start)
         for token in lexer.tokenize():
             if token.type == "TEXT":
                 stack[-1].children.append(Text(token.text))
-            elif token.keyword in self.keywords:
-                handler, endword = self.keywords[token.keyword]
+                continue
+            entry = keywords.get(token.keyword)
+            if entry is not None:
+                handler, endword = entry
                 if endword:
                     node = BlockShortcode(token, handler)
                     stack[-1].children.append(node)
@@ -188,7 +239,7 @@ class Parser:
                 else:
                     node = AtomicShortcode(token, handler)
                     stack[-1].children.append(node)
-            elif token.keyword in self.endwords:
+            elif token.keyword in endwords:
                 if len(expecting) == 0:
                     msg = f"Unexpected '{token.keyword}' tag in line {token.line_number}."
                     raise ShortcodeSyntaxError(msg)
@@ -226,9 +277,12 @@ class Parser:
 
 class Token:
 
+    # Only tag tokens have a keyword and an argument string. We avoid splitting
+    # text tokens as they can be arbitrarily long.
     def __init__(self, token_type, token_text, raw_text, line_number):
-        words = token_text.split()
+        words = token_text.split(None, 1) if token_type == "TAG" else []
         self.keyword = words[0] if words else ''
+        self.args = words[1] if len(words) > 1 else ''
         self.type = token_type
         self.text = token_text
         self.raw_text = raw_text
@@ -254,46 +308,55 @@ class Lexer:
             return True
         return False
 
-    def advance(self):
-        if self.text[self.index] == '\n':
-            self.line_number += 1
-        self.index += 1
-
     def tokenize(self):
         while self.index < len(self.text):
-            if self.match(self.esc_start):
-                self.read_escaped_tag_delimiter()
-            elif self.match(self.start):
+            if self.match(self.start) and not self.match(self.esc_start):
                 self.read_tag()
             else:
                 self.read_text()
         return self.tokens
 
-    def read_escaped_tag_delimiter(self):
-        self.index += len(self.esc_start)
-        self.tokens.append(Token("TEXT", self.start, self.esc_start, self.line_number))
-
     def read_tag(self):
-        self.index += len(self.start)
-        start_index = self.index
+        start_index = self.index + len(self.start)
         start_line_number = self.line_number
-        while self.index < len(self.text):
-            if self.match(self.end):
-                text = self.text[start_index:self.index].strip()
-                raw_text = self.text[start_index-len(self.start):self.index+len(self.end)]
-                self.tokens.append(Token("TAG", text, raw_text, start_line_number))
-                self.index += len(self.end)
-                return
-            self.advance()
-        msg = f"Unclosed shortcode tag. The tag was opened in line {start_line_number}."
-        raise ShortcodeSyntaxError(msg)
-
+        end_index = self.text.find(self.end, start_index)
+        if end_index == -1:
+            msg = f"Unclosed shortcode tag. The tag was opened in line {start_line_number}."
+            raise ShortcodeSyntaxError(msg)
+        text = self.text[start_index:end_index].strip()
+        raw_text = self.text[self.index:end_index+len(self.end)]
+        self.tokens.append(Token("TAG", text, raw_text, start_line_number))
+        self.line_number += self.text.count('\n', start_index, end_index)
+        self.index = end_index + len(self.end)
+
+    # A text token runs up to the next unescaped tag. Escaped tag delimiters
+    # are unescaped and included in the token so adjacent runs of text always
+    # produce a single token.
     def read_text(self):
         start_index = self.index
         start_line_number = self.line_number
+        pieces = []
         while self.index < len(self.text):
-            if self.match(self.esc_start) or self.match(self.start):
+            if self.match(self.esc_start):
+                pieces.append(self.start)
+                self.index += len(self.esc_start)
+                continue
+            if self.match(self.start):
                 break
-            self.advance()
-        text = self.text[start_index:self.index]
-        self.tokens.append(Token("TEXT", text, text, start_line_number))
+            # An escaped delimiter contains the start delimiter so if there's no
+            # tag left there can't be an escaped delimiter either. Otherwise we
+            # only need to search for one that begins before the next tag.
+            end_index = self.text.find(self.start, self.index)
+            if end_index == -1:
+                end_index = len(self.text)
+            else:
+                bound = end_index + len(self.esc_start) - 1
+                esc_index = self.text.find(self.esc_start, self.index, bound)
+                if esc_index != -1:
+                    end_index = esc_index
+            pieces.append(self.text[self.index:end_index])
+            self.line_number += self.text.count('\n', self.index, end_index)
+            self.index = end_index
+        text = ''.join(pieces)
+        raw_text = self.text[start_index:self.index]
+        self.tokens.append(Token("TEXT", text, raw_text, start_line_number))
@@ -5,6 +5,7 @@
 
 import shortcodes
 import pytest
+import itertools
 
 
 # ------------------------------------------------------------------------------
@@ -19,14 +20,14 @@ def foo_handler(pargs, kwargs, context):
 
 @shortcodes.register('wrap', 'endwrap')
 def wrap_handler(pargs, kwargs, context, content):
-    return '<%s>%s</%s>' % (pargs[0], content, pargs[0])
+    tag = pargs[0]
+    return f'<{tag}>{content}</{tag}>'
 
 
 @shortcodes.register('args')
 def args_handler(pargs, kwargs, context):
-    for key, value in sorted(kwargs.items()):
-        pargs.append(key + ':' + value)
-    return '|'.join(pargs)
+    kwstrings = (f'{key}:{value}' for key, value in sorted(kwargs.items()))
+    return '|'.join(itertools.chain(pargs, kwstrings))
 
 
 @shortcodes.register('context')
@@ -36,36 +37,48 @@ def context_handler(pargs, kwargs, context):
 
 @shortcodes.register('divbyzero')
 def divbyzero_handler(pargs, kwargs, context):
-    x = 1 / 0
+    1 / 0
     return 'we never make it here'
 
 
+# ------------------------------------------------------------------------------
+# Fixtures.
+# ------------------------------------------------------------------------------
+
+
+# A parser with the default settings. Parsing doesn't modify the parser so a
+# single instance can be shared by every test in the module.
+@pytest.fixture(scope="module")
+def parser():
+    return shortcodes.Parser()
+
+
 # ------------------------------------------------------------------------------
 # Basic shortcode insertion tests.
 # ------------------------------------------------------------------------------
 
 
-def test_parse_empty_string():
+def test_parse_empty_string(parser):
     text = ''
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == ''
 
 
-def test_parse_string_no_shortcodes():
+def test_parse_string_no_shortcodes(parser):
     text = 'foo'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'foo'
 
 
-def test_parse_single_shortcode():
+def test_parse_single_shortcode(parser):
     text = '[% foo %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'bar'
 
 
-def test_parse_single_shortcode_with_text():
+def test_parse_single_shortcode_with_text(parser):
     text = '..[% foo %]..'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == '..bar..'
 
 
@@ -74,120 +87,150 @@ def test_parse_single_shortcode_with_text():
 # ------------------------------------------------------------------------------
 
 
-def test_escaped_shortcode():
+def test_escaped_shortcode(parser):
     text = r'\[% foo %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == '[% foo %]'
 
 
-def test_double_escaped_shortcode():
+def test_double_escaped_shortcode(parser):
     text = r'\\[% foo %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == r'\[% foo %]'
 
 
+def test_escaped_shortcode_with_text(parser):
+    text = r'..\[% foo %]..[% foo %]..'
+    rendered = parser.parse(text)
+    assert rendered == '..[% foo %]..bar..'
+
+
 # ------------------------------------------------------------------------------
 # Test shortcode arguments.
 # ------------------------------------------------------------------------------
 
 
-def test_shortcode_with_single_quoted_args():
+def test_shortcode_with_single_quoted_args(parser):
     text = "[% args arg1 'arg 2' key1=arg3 key2='arg 4' %]"
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'arg1|arg 2|key1:arg3|key2:arg 4'
 
 
-def test_shortcode_with_double_quoted_args():
+def test_shortcode_with_double_quoted_args(parser):
     text = '[% args arg1 "arg 2" key1=arg3 key2="arg 4" %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'arg1|arg 2|key1:arg3|key2:arg 4'
 
 
-def test_positional_arg_with_single_quoted_equals_symbol():
+def test_positional_arg_with_single_quoted_equals_symbol(parser):
     text = "[% args arg1 'foo=bar' %]"
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'arg1|foo=bar'
 
 
-def test_positional_arg_with_double_quoted_equals_symbol():
+def test_positional_arg_with_double_quoted_equals_symbol(parser):
     text = '[% args arg1 "foo=bar" %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'arg1|foo=bar'
 
 
-def test_single_quoted_positional_arg_with_multiple_equals_symbols():
+def test_single_quoted_positional_arg_with_multiple_equals_symbols(parser):
     text = "[% args arg1 'foo=bar=baz' %]"
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'arg1|foo=bar=baz'
 
 
-def test_double_quoted_positional_arg_with_multiple_equals_symbols():
+def test_double_quoted_positional_arg_with_multiple_equals_symbols(parser):
     text = '[% args arg1 "foo=bar=baz" %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'arg1|foo=bar=baz'
 
 
-def test_single_quoted_keyword_arg_with_equals_symbol():
+def test_single_quoted_keyword_arg_with_equals_symbol(parser):
     text= "[% args arg1 foo='bar=baz' %]"
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'arg1|foo:bar=baz'
 
 
-def test_double_quoted_keyword_arg_with_equals_symbol():
+def test_double_quoted_keyword_arg_with_equals_symbol(parser):
     text= '[% args arg1 foo="bar=baz" %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'arg1|foo:bar=baz'
 
 
-def test_single_quoted_keyword_arg_with_equals_symbol_and_spaces():
+def test_single_quoted_keyword_arg_with_equals_symbol_and_spaces(parser):
     text= "[% args arg1 foo='bar= baz ' %]"
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'arg1|foo:bar= baz '
 
 
-def test_double_quoted_keyword_arg_with_equals_symbol_and_spaces():
+def test_double_quoted_keyword_arg_with_equals_symbol_and_spaces(parser):
     text= '[% args arg1 foo="bar= baz " %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'arg1|foo:bar= baz '
 
 
+def test_unquoted_keyword_arg_with_equals_symbol(parser):
+    text= '[% args arg1 foo=bar=baz %]'
+    rendered = parser.parse(text)
+    assert rendered == 'arg1|foo:bar=baz'
+
+
+def test_unquoted_positional_arg_with_equals_symbol_at_ends(parser):
+    text= '[% args =foo bar= %]'
+    rendered = parser.parse(text)
+    assert rendered == '=foo|bar='
+
+
+def test_empty_quoted_args(parser):
+    text= '[% args "" \'\' key1="" key2=\'\' %]'
+    rendered = parser.parse(text)
+    assert rendered == '||key1:|key2:'
+
+
 # ------------------------------------------------------------------------------
 # Test shortcode nesting.
 # ------------------------------------------------------------------------------
 
 
-def test_wrapping_simple_text():
+def test_wrapping_simple_text(parser):
     text = '[% wrap div %]foo[% endwrap %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == '<div>foo</div>'
 
 
-def test_wrapping_shortcode():
+def test_wrapping_shortcode(parser):
     text = '[% wrap div %][% foo %][% endwrap %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == '<div>bar</div>'
 
 
-def test_wrapping_wrapping_shortcode():
+def test_wrapping_wrapping_shortcode(parser):
     text = '[% wrap div %][% wrap p %][% foo %][% endwrap %][% endwrap %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == '<div><p>bar</p></div>'
 
 
-def test_wrapping_and_text_mix():
+def test_wrapping_and_text_mix(parser):
     text = '[% wrap div %]..[% wrap p %].[% foo %].[% endwrap %]..[% endwrap %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == '<div>..<p>.bar.</p>..</div>'
 
 
+def test_deeply_nested_wrapping(parser):
+    text = '[% wrap p %]' * 5000 + 'foo' + '[% endwrap %]' * 5000
+    rendered = parser.parse(text)
+    assert rendered == '<p>' * 5000 + 'foo' + '</p>' * 5000
+
+
 # ------------------------------------------------------------------------------
 # Test context object support.
 # ------------------------------------------------------------------------------
 
 
-def test_context_object():
+def test_context_object(parser):
     text = '[% context %]'
-    rendered = shortcodes.Parser().parse(text, 101)
+    rendered = parser.parse(text, 101)
     assert rendered == '101'
 
 
@@ -217,23 +260,30 @@ def test_locally_registered_wrap():
 # ------------------------------------------------------------------------------
 
 
-def test_handler_exception():
+def test_handler_exception(parser):
     text = '[% divbyzero %]'
     with pytest.raises(shortcodes.ShortcodeRenderingError) as exinfo:
-        shortcodes.Parser().parse(text)
+        parser.parse(text)
     assert isinstance(exinfo.value.__cause__, ZeroDivisionError)
 
 
-def test_invalid_tag_exception():
+def test_invalid_tag_exception(parser):
     text = '[% notregistered %]'
     with pytest.raises(shortcodes.ShortcodeSyntaxError):
-        shortcodes.Parser().parse(text)
+        parser.parse(text)
 
 
-def test_unbalanced_tags_exception():
+def test_unbalanced_tags_exception(parser):
     text = '[% wrap %] missing end tag...'
     with pytest.raises(shortcodes.ShortcodeSyntaxError):
-        shortcodes.Parser().parse(text)
+        parser.parse(text)
+
+
+def test_exception_line_number(parser):
+    text = 'foo\n[% foo\n %] \\[% foo %]\n[% notregistered %]'
+    with pytest.raises(shortcodes.ShortcodeSyntaxError) as exinfo:
+        parser.parse(text)
+    assert 'in line 4' in str(exinfo.value)
 
 
 # ------------------------------------------------------------------------------
@@ -241,9 +291,9 @@ def test_unbalanced_tags_exception():
 # ------------------------------------------------------------------------------
 
 
-def test_nonascii_args():
+def test_nonascii_args(parser):
     text = '[% args pøs0 k€¥="välué" %]'
-    rendered = shortcodes.Parser().parse(text)
+    rendered = parser.parse(text)
     assert rendered == 'pøs0|k€¥:välué'
 
 